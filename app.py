@@ -1,6 +1,9 @@
 # Import os to interact with the file system (like saving uploads)
 import os
 
+# Import numpy for the date constant used by the vectorized KYC check
+import numpy as np
+
 # Import pandas to work with CSV files and data validation later
 import pandas as pd
 
@@ -8,8 +11,14 @@ import pandas as pd
 # In production, load this from an environment variable instead of hard-coding
 import secrets
 
+import logging # To gate debug output on the app logger's level
+
 import io # Import io to handle file-like objects (if needed for advanced file handling)
 
+import hashlib # To fingerprint uploaded files so repeat uploads reuse their summary
+
+import time # To spot processing jobs that were lost (e.g. to a worker restart)
+
 # Import the necessary Flask tools to create a web server
 from flask import Flask, request, render_template, redirect, url_for
 
@@ -21,11 +30,16 @@ from flask import send_file # To send files back to the user (if needed later)
 
 from functools import wraps # For creating decorators to protect routes
 
+from concurrent.futures import ThreadPoolExecutor # To run the CSV pipeline off the request thread
+
+from werkzeug.utils import secure_filename # To sanitize uploaded filenames
+from werkzeug.security import generate_password_hash, check_password_hash # To store and check passwords as hashes
+
 from rules import (
-    check_kyc_status,
-    flag_high_value,
+    check_kyc_status_series,
+    flag_high_value_series,
     compute_txns_last_window,
-    compute_frequency_flag,
+    flag_txn_frequency,
     aggregate_agent_risk
 )
 
@@ -38,11 +52,25 @@ thresholds = {
 }
 # -------------------------------------------------------------------
 
-# MVP user store: username { password, role }
+# Columns every uploaded CSV must have, in the order used for error messages
+REQUIRED_COLUMNS = (
+    'agent_id',
+    'agent_name',
+    'kyc_status',
+    'id_expiry',
+    'txn_amount',
+    'txn_time'
+)
+REQUIRED_COLUMN_SET = frozenset(REQUIRED_COLUMNS)
+
+# MVP user store: username { password_hash, role }
+# Passwords are hashed once at startup; only the hashes are kept in memory
 USERS = {
-    'admin':   {'password': 'AdminPass123',   'role': 'admin'},
-    'officer': {'password': 'OfficerPass456', 'role': 'officer'}
+    'admin':   {'password_hash': generate_password_hash('AdminPass123'),   'role': 'admin'},
+    'officer': {'password_hash': generate_password_hash('OfficerPass456'), 'role': 'officer'}
 }
+# Checked for unknown usernames so they take as long to reject as a wrong password
+DUMMY_PASSWORD_HASH = generate_password_hash(secrets.token_hex(16))
 # This is a simple in-memory user store for demonstration purposes
 # In a real app, use a database or secure vault for user credentials
 
@@ -52,6 +80,12 @@ app = Flask(__name__)
 app.secret_key = secrets.token_hex(16)  # Generate a random secret key for session management
 # This key is used to sign session cookies and should be kept secret in production
 
+# Debug mode only when FLASK_DEBUG=1 is set in the environment
+DEBUG: bool = os.environ.get('FLASK_DEBUG') == '1'
+# Outside debug, Jinja compiles each template once and serves it from its cache
+# instead of stat()-ing the file on every render_template call
+app.config['TEMPLATES_AUTO_RELOAD'] = DEBUG
+
 # Define the folder where uploaded files will be saved
 UPLOAD_FOLDER: str = 'uploads'
 # Tell Flask to use this folder for file uploads
@@ -60,16 +94,120 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 # Create the uploads folder if it doesn't already exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Define a decorator to protect routes that require login
-# This will check if the user is logged in before allowing access to certain routes
-def login_required(f):
-    @wraps(f)
-    def wrapped(*args, **kwargs):
-        if 'user' not in session:
-            # Not logged in? Send them to login page
-            return redirect(url_for('login'))
-        return f(*args, **kwargs)
-    return wrapped
+# Define the folder where computed agent summaries are kept between requests;
+# the session cookie only carries the key of the file for the user's last upload
+CACHE_FOLDER: str = 'cache'
+app.config['CACHE_FOLDER'] = CACHE_FOLDER
+os.makedirs(CACHE_FOLDER, exist_ok=True)
+
+def summary_path(key):
+    """Path of the stored agent summary CSV for a summary key (a content hash)."""
+    return os.path.join(app.config['CACHE_FOLDER'], f'{key}.csv')
+
+def error_path(key):
+    """Path of the stored validation error for a rejected upload's summary key."""
+    return os.path.join(app.config['CACHE_FOLDER'], f'{key}.err')
+
+def failure_path(key):
+    """
+    Path of the message for a job that failed unexpectedly (e.g. a full disk);
+    shown once and then removed, so uploading the same file again retries it.
+    """
+    return os.path.join(app.config['CACHE_FOLDER'], f'{key}.failed')
+
+def pending_path(key):
+    """Path of the marker that exists while an upload's job is queued or running."""
+    return os.path.join(app.config['CACHE_FOLDER'], f'{key}.pending')
+
+def pending_age(key):
+    """Seconds since the job for key was queued, or None if none is pending."""
+    try:
+        return time.time() - os.path.getmtime(pending_path(key))
+    except FileNotFoundError:
+        return None
+
+def claim_job(key):
+    """
+    Atomically creates pending_path(key), replacing a stale one. Returns False
+    if another request (in any worker process) already has the job queued.
+    """
+    age = pending_age(key)
+    if age is not None and age > PROCESSING_TIMEOUT:
+        try:
+            os.remove(pending_path(key))
+        except FileNotFoundError:
+            pass  # another request replaced it first
+    try:
+        os.close(os.open(pending_path(key), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False
+    return True
+
+def write_atomic(path, text):
+    """Write text to path via a temp file, so readers never see a partial file."""
+    tmp_path = f'{path}.{secrets.token_hex(4)}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def load_summary():
+    """Agent summary for the current session's last upload, or an empty DataFrame."""
+    key = session.get('summary_key')
+    if not key or not os.path.exists(summary_path(key)):
+        return pd.DataFrame(columns=['agent_id', 'risk_status'])
+    return pd.read_csv(summary_path(key), dtype=str)
+
+# Number of CSV rows parsed and checked at a time, bounding memory on large uploads
+CSV_CHUNK_SIZE: int = 100_000
+
+# Background workers that run the compliance pipeline for new uploads. Job state
+# is kept on disk (a pending marker, then a summary, error or failure file), so
+# any worker process can serve the dashboard and jobs lost to a restart show up
+PROCESSING_WORKERS: int = 2
+executor = ThreadPoolExecutor(max_workers=PROCESSING_WORKERS)
+
+# Seconds after which a job that is still pending is reported as lost
+PROCESSING_TIMEOUT: int = 15 * 60
+
+# Seconds a stored summary, error or failure is kept. Keys include the run
+# date, so older files are only read by sessions that still point at them
+CACHE_MAX_AGE: int = 7 * 24 * 60 * 60
+
+def evict_stale_cache():
+    """Removes files in CACHE_FOLDER last written more than CACHE_MAX_AGE ago."""
+    cutoff = time.time() - CACHE_MAX_AGE
+    with os.scandir(app.config['CACHE_FOLDER']) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # removed by another worker
+
+# Bytes read from the upload stream per write (and per hash update);
+# 1 MiB blocks keep the syscall count low on large CSVs
+UPLOAD_BLOCK_SIZE: int = 1 << 20
+
+# Define a decorator to protect routes that require login and a role
+# One wrapper does both checks, so each protected request pays a single extra call
+def require(*allowed_roles):
+    """
+    Redirects to login if no one is logged in, and returns 403 unless the
+    logged-in user’s role is in the allowed list (any role if none given).
+    Usage: @require('admin', 'officer')
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            if 'user' not in session:
+                # Not logged in? Send them to login page
+                return redirect(url_for('login'))
+            if allowed_roles and session.get('role') not in allowed_roles:
+                # Optionally, flash an error or render a “403 Forbidden” page
+                return "Forbidden: insufficient permissions", 403
+            return f(*args, **kwargs)
+        return wrapped
+    return decorator
 
 # Define the login route that handles both GET and POST requests
 # GET shows the login form, POST processes the login attempt
@@ -81,8 +219,9 @@ def login():
         password = request.form.get('password', '')
         user = USERS.get(username)
 
-        # Basic credential check
-        if not user or user['password'] != password:
+        # Credential check against the stored hash (constant-time compare)
+        password_hash = user['password_hash'] if user else DUMMY_PASSWORD_HASH
+        if not check_password_hash(password_hash, password) or not user:
             error = "Invalid username or password."
         else:
             # Credentials OK - store user info in session
@@ -100,36 +239,188 @@ def logout():
     session.clear()
     return redirect(url_for('login'))
 
-# Define a decorator to restrict access to certain roles
-# This will check if the logged-in user has one of the allowed roles
-def role_required(*allowed_roles):
+# EPIC 2: Compliance rules pipeline
+# Runs on a background worker so the upload request returns straight away
+def process_csv(filepath, key, thresholds, run_date):
     """
-    Ensures the logged-in user’s role is in the allowed list.
-    Usage: @role_required('admin', 'officer')
+    Validates the uploaded CSV, runs the KYC/AML rules and writes the agent
+    summary to summary_path(key). Returns None on success, or an
+    (error message, status) tuple when the file is rejected.
+    Failures that aren't about the file's contents (OSError, MemoryError, …)
+    are raised, not returned. `thresholds` is a snapshot taken at upload time.
     """
-    def decorator(f):
-        @wraps(f)
-        def wrapped(*args, **kwargs):
-            user_role = session.get('role')
-            if user_role not in allowed_roles:
-                # Optionally, flash an error or render a “403 Forbidden” page
-                return "Forbidden: insufficient permissions", 403
-            return f(*args, **kwargs)
-        return wrapped
-    return decorator
+    # START CSV VALIDATION BLOCK
+    try:
+        # MVP Task 1.2: Validate CSV structure and content (headers, data types)
+        # Read only the header row first so a missing column gets a clear message
+        # (read_csv refuses parse_dates for columns that aren't there)
+        header = pd.read_csv(filepath, nrows=0).columns
+
+        # Check for missing required columns with one hash-based set difference,
+        # then list them in REQUIRED_COLUMNS order for a stable message
+        missing = REQUIRED_COLUMN_SET.difference(header)
+        if missing:
+            missing_cols = [col for col in REQUIRED_COLUMNS if col in missing]
+            return f"Missing required columns: {', '.join(missing_cols)}", 400
+
+        # Task 1.3: Save parsed data to in-memory Pandas DataFrame or DB
+        # Get today’s date for expiry comparison (built once, not per row)
+        today = np.datetime64(run_date, 'ns')
+
+        # Per-row columns the frequency rule and the risk aggregation still need;
+        # everything else is dropped as soon as its chunk has been checked
+        KEEP_COLUMNS = ['agent_id', 'txn_time', 'kyc_flag', 'aml_flag']
+
+        parts = []
+        invalid_columns = set()
+
+        # Stream the CSV in chunks of CSV_CHUNK_SIZE rows, typing columns while
+        # parsing: the C parser strips thousands separators from txn_amount and
+        # converts the date columns in the same pass. Columns outside
+        # REQUIRED_COLUMNS are skipped by the parser and never materialized.
+        with pd.read_csv(
+            filepath,
+            usecols=REQUIRED_COLUMNS,
+            dtype={'agent_id': 'category', 'agent_name': 'string', 'kyc_status': 'category'},
+            parse_dates=['id_expiry', 'txn_time'],
+            thousands=',',
+            chunksize=CSV_CHUNK_SIZE
+        ) as reader:
+            for chunk in reader:
+                # Check for any missing values (one column-wise reduction)
+                if chunk.isna().any(axis=0).any():
+                    return "CSV contains missing values", 400
+
+                # A column is left as text when any of its values is malformed;
+                # coerce only those, and only they can hold invalid (now NaN/NaT) cells.
+                # Columns the parser typed are known valid and aren't scanned again.
+                # A True/False column parses as bool, which isn't a valid amount:
+                # coerce it from its text so every value is rejected.
+                amount = chunk['txn_amount']
+                if pd.api.types.is_bool_dtype(amount):
+                    amount = amount.astype(str)
+                if not pd.api.types.is_numeric_dtype(amount):
+                    chunk['txn_amount'] = pd.to_numeric(amount, errors='coerce')
+                    if chunk['txn_amount'].isna().any():
+                        invalid_columns.add('txn_amount')
+
+                for col in ('txn_time', 'id_expiry'):
+                    if not pd.api.types.is_datetime64_any_dtype(chunk[col]):
+                        chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+                        if chunk[col].isna().any():
+                            invalid_columns.add(col)
+
+                # Once the file is known to be invalid, later chunks are only
+                # read to look for missing values, which take precedence
+                if invalid_columns:
+                    continue
+
+                # ——— INLINE COMPLIANCE LOGIC STARTS HERE ———
+
+                # Task 2.1: Implement KYC completeness checker
+                # Whole-column check instead of a per-row df.apply
+                chunk['kyc_flag'] = check_kyc_status_series(chunk['kyc_status'], chunk['id_expiry'], today)
+
+                # Task 2.2: Implement AML rule: flag txn > threshold
+                # If amount > threshold → "ALERT", else → "OK"
+                chunk['aml_flag'] = flag_high_value_series(chunk['txn_amount'], thresholds['high_value'])
+
+                parts.append(chunk[KEEP_COLUMNS])
+
+        # If any invalid columns found, build the error message in column order
+        if invalid_columns:
+            invalid_columns = [c for c in ('txn_amount', 'txn_time', 'id_expiry') if c in invalid_columns]
+            return f"Invalid data types in column(s): {', '.join(invalid_columns)}", 400
+
+        df = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=KEEP_COLUMNS)
+
+        # Chunks can carry different agent_id categories, which concat turns back
+        # into plain strings; re-encode once so the groupby works on integer codes
+        df['agent_id'] = df['agent_id'].astype('category')
+
+        # Debug output; DataFrame reprs are only built when debug logging is on
+        debug = app.logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            app.logger.debug("Parsed CSV:\n%s\nColumn Types:\n%s", df.head(), df.dtypes)
+            app.logger.debug("KYC and AML Flags:\n%s", df[['agent_id', 'kyc_flag', 'aml_flag']])
+
+        # Task 2.3: Implement AML rule: flag >3 txns/hour per agent
+        # Window counts and the ALERT/OK comparison run in one pass
+        df['frequency_flag'] = flag_txn_frequency(
+            df['txn_time'], thresholds['frequency_window'], thresholds['frequency_limit']
+        )
+
+        # For debug output (the per-row counts are only computed for the log)
+        if debug:
+            df['txns_last_hour'] = compute_txns_last_window(df['txn_time'], thresholds['frequency_window'])
+            app.logger.debug("Frequency-based flags:\n%s", df[['agent_id','txn_time','txns_last_hour','frequency_flag']])
+
+        # Task 2.4: Aggregate Overall Risk per Agent
+        # Define a helper that takes a DataFrame slice for one agent
+        agent_summary = aggregate_agent_risk(df)
+
+        # agent_id is read as text categories, which sort lexicographically;
+        # when every ID is a number, list agents in numeric order as before
+        numeric_ids = pd.to_numeric(agent_summary['agent_id'], errors='coerce')
+        if numeric_ids.notna().all():
+            agent_summary = agent_summary.iloc[np.argsort(numeric_ids.to_numpy(), kind='stable')]
+
+        # Log the summary for debug
+        if debug:
+            app.logger.debug("Agent Risk Summary:\n%s", agent_summary)
+
+        # ——— INLINE COMPLIANCE LOGIC ENDS HERE ———
+
+        # Write the summary to disk; only its key is kept in the session,
+        # so the signed cookie stays small however many agents there are.
+        # Write to a temp file first so a concurrent upload of the same file
+        # never reads a half-written summary
+        write_atomic(summary_path(key), agent_summary.to_csv(index=False))
+        return None
+
+    except ValueError as e:
+         # Handle errors during CSV parsing (the parser's errors, including
+         # empty files and bad encodings, are all ValueErrors)
+        return f"Error reading and parsing file: {str(e)}", 400
+    # END CSV VALIDATION BLOCK
+
+def run_upload_job(filepath, key, thresholds, run_date):
+    """
+    Background job for one upload: runs process_csv and, if the file is
+    rejected, stores the error message at error_path(key) for the dashboard.
+    Unexpected failures go to failure_path(key) instead, so they aren't
+    reused for later uploads of the same file. Whatever happens, the uploaded
+    file is then deleted (the outcome is all that's kept) and the pending
+    marker is removed last.
+    """
+    try:
+        result = process_csv(filepath, key, thresholds, run_date)
+        if result is not None:
+            message, _status = result
+            write_atomic(error_path(key), message)
+    except Exception as e:
+        app.logger.exception("Processing %s failed", filepath)
+        write_atomic(failure_path(key), f"Error processing file: {str(e)}")
+    finally:
+        try:
+            os.remove(filepath)
+            evict_stale_cache()
+        finally:
+            try:
+                os.remove(pending_path(key))
+            except FileNotFoundError:
+                pass
 
 # EPIC 1: File Upload & CSV Validation Task 1.1: Build Flask route for file upload
 # This route will handle the file upload from the HTML form
 # Define the home route ("/") that displays the upload form
 @app.route('/')
-@login_required  # Protect this route so only logged-in users can access it
-@role_required('admin', 'officer')
+@require('admin', 'officer')  # Protect this route so only logged-in officers/admins can access it
 def home():
     return render_template('upload.html') # Load the HTML form from the templates folder
 
 @app.route('/upload', methods=['POST'])  # This route only responds to POST requests from the form
-@login_required  # Protect this route so only logged-in users can access it
-@role_required('admin', 'officer')
+@require('admin', 'officer')  # Protect this route so only logged-in officers/admins can access it
 def upload_file():
     # Check if the form actually included a file
     if 'file' not in request.files:
@@ -141,135 +432,69 @@ def upload_file():
     if not file or not file.filename:
         return "No selected file", 400
     
-    # Safer filename validation    # Ensure the file is a CSV
-    # Check if the filename is a string and ends with .csv
-    if isinstance(file.filename, str) and file.filename.lower().endswith('.csv'):
+    # Safer filename validation: strip path parts and unsafe characters
+    filename = secure_filename(file.filename)
+    # Ensure the file is a CSV
+    if filename.lower().endswith('.csv'):
          # Build a safe filepath in the "uploads" directory
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
 
-        # Save the file to disk
-        file.save(filepath)
-        # Optional: print the path to console for debugging
-        print(f"Saved to: {filepath}")
+        # Date the KYC expiry check runs against; part of the cache key below
+        run_date = datetime.today().date()
 
-        # START CSV VALIDATION BLOCK
+        # Save the file to disk, hashing the bytes as they stream through;
+        # if the client disconnects or the write fails, don't leave the part file behind
+        part_path = f'{filepath}.{secrets.token_hex(4)}.part'
+        digest = hashlib.blake2b(digest_size=16)
         try:
-            # MVP Task 1.2: Validate CSV structure and content (headers, data types)
-            # Load CSV file into a Pandas DataFrame
-            df = pd.read_csv(filepath)
-
-            # Task 1.3: Save parsed data to in-memory Pandas DataFrame or DB
-            # Define expected columns
-            REQUIRED_COLUMNS = [
-                'agent_id',
-                'agent_name',
-                'kyc_status',
-                'id_expiry',
-                'txn_amount',
-                'txn_time'
-            ]
-
-            # Check for missing required columns
-            missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
-            if missing_cols:
-                return f"Missing required columns: {', '.join(missing_cols)}", 400
-
-            # Check for any missing values
-            if df.isnull().any().any():
-                return "CSV contains missing values", 400
-            
-            # Try converting txn_amount to numeric 
-            # # Clean commas out of txn_amount before converting
-            df['txn_amount'] = pd.to_numeric(df['txn_amount'].astype(str).str.replace(',', ''), errors='coerce')
-
-            # Try converting txn_time and id_expiry to datetime
-            df['txn_time'] = pd.to_datetime(df['txn_time'], errors='coerce')
-            df['id_expiry'] = pd.to_datetime(df['id_expiry'], errors='coerce')
-
-            # Check each field individually for NaN/NaT issues and build error message
-            invalid_columns = []
-
-            if df['txn_amount'].isnull().any():
-                invalid_columns.append('txn_amount')
-
-            if df['txn_time'].isnull().any():
-                invalid_columns.append('txn_time')
-
-            if df['id_expiry'].isnull().any():
-                invalid_columns.append('id_expiry')
-
-            # If any invalid columns found, return specific message
-            if invalid_columns:
-                return f"Invalid data types in column(s): {', '.join(invalid_columns)}", 400
-
-            print("Parsed CSV:")
-            print(df.head()) # For debug
-            print("Column Types:")
-            print(df.dtypes) # For debug
-
-             # ——— INLINE COMPLIANCE LOGIC STARTS HERE ———
-
-            # Task 2.1: Implement KYC completeness checker
-            # Get today’s date for expiry comparison
-            today = pd.to_datetime(datetime.today().date())
-
-            df['kyc_flag'] = df.apply(
-                lambda r: check_kyc_status(r['kyc_status'], r['id_expiry'], today),
-                axis=1
-            )
-
-            # View results for debug
-            print("KYC Flags:")
-            print(df[['agent_id', 'kyc_status', 'id_expiry', 'kyc_flag']])
-
-            # Task 2.2: Implement AML rule: flag txn > threshold
-            # Define your high-value threshold
-            #HIGH_VALUE_THRESHOLD = thresholds['high_value']
-
-            # Create a new column 'aml_flag' based on txn_amount
-            # If amount > threshold → "ALERT", else → "OK"
-            df['aml_flag'] = df['txn_amount'].apply(
-                lambda amt: flag_high_value(amt, thresholds['high_value'])
-            )
-
-            # For debug print
-            print("AML Flags (High-Value Transactions):")
-            print(df[['agent_id', 'txn_amount', 'aml_flag']])
-
-            # Task 2.3: Implement AML rule: flag >3 txns/hour per agent
-            # Sort by agent and time so rolling windows work correctly
-            txns_last = compute_txns_last_window(df['txn_time'], thresholds['frequency_window'])
-            df['txns_last_hour'] = txns_last 
-            df['frequency_flag'] = compute_frequency_flag(txns_last, thresholds['frequency_limit'])
-
-            # For debug print
-            print("Frequency-based flags:")
-            print(df[['agent_id','txn_time','txns_last_hour','frequency_flag']])
-
-            # Task 2.4: Aggregate Overall Risk per Agent
-            # Define a helper that takes a DataFrame slice for one agent
-            agent_summary = aggregate_agent_risk(df)
-
-            # Print the summary for debug
-            print("Agent Risk Summary:")
-            print(agent_summary)
-
-            # ——— INLINE COMPLIANCE LOGIC ENDS HERE ———
-
-            # Convert summary DF to list-of-dicts and store in session
-            session['agent_summary'] = agent_summary.to_dict(orient='records')
-            # This allows us to access it later in the dashboard route
-
-            # Proceed to next route or render template with DataFrame
-            #return f"File {file.filename} uploaded, validated, and KYC, AML checks & agent risk summary generated successfully!"
-
-            # …then send them straight to the dashboard
+            with open(part_path, 'wb', buffering=UPLOAD_BLOCK_SIZE) as dst:
+                for block in iter(lambda: file.stream.read(UPLOAD_BLOCK_SIZE), b''):
+                    digest.update(block)
+                    dst.write(block)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+        # The summary depends on the file, the thresholds and today's date;
+        # if all three match an earlier upload, reuse its stored summary
+        digest.update(repr(sorted(thresholds.items())).encode())
+        digest.update(run_date.isoformat().encode())
+        key = digest.hexdigest()
+
+        # A stored summary or error means this exact file was already processed
+        if os.path.exists(summary_path(key)) or os.path.exists(error_path(key)):
+            os.remove(part_path)
+            session['summary_key'] = key
             return redirect(url_for('dashboard'))
 
-        except Exception as e:
-             # Handle errors during CSV parsing
-            return f"Error reading and parsing file: {str(e)}", 400
-        # END CSV VALIDATION BLOCK
+        # Run the pipeline on a worker unless this file is already queued or running
+        # (in any worker process); the dashboard shows its result (or validation
+        # error) once it finishes
+        session['summary_key'] = key
+        if not claim_job(key):
+            os.remove(part_path)
+            return redirect(url_for('dashboard'))
+
+        # A failure from an earlier attempt no longer applies
+        if os.path.exists(failure_path(key)):
+            os.remove(failure_path(key))
+
+        # Name the saved file by its key so a queued job never reads bytes
+        # from a later upload that happens to share the filename
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f'{key}_{filename}')
+        os.replace(part_path, filepath)
+        # Optional: log the path for debugging
+        app.logger.debug("Saved to: %s", filepath)
+
+        try:
+            executor.submit(run_upload_job, filepath, key, dict(thresholds), run_date)
+        except BaseException:
+            os.remove(pending_path(key))
+            raise
+
+        # …then send them straight to the dashboard
+        return redirect(url_for('dashboard'))
                  
     # If the file is not a CSV, return an error
     return "Invalid file type", 400
@@ -278,30 +503,67 @@ def upload_file():
 # Task 3.2: Display flagged agents in table with color-coded statuses Task 3.3: Enable download of TXT/PDF summary report
 
 @app.route('/dashboard')
-@login_required  # Protect this route so only logged-in users can access it
-@role_required('admin', 'officer')
+@require('admin', 'officer')  # Protect this route so only logged-in officers/admins can access it
 def dashboard():
-    # Retrieve the agent_summary DataFrame we stored in session
-    data = session.get('agent_summary', [])
+    # The job's state is read from disk, so this works on any worker process.
+    # While the last upload is being processed, show a self-refreshing page.
+    # The pending marker is checked first: a job writes its outcome before
+    # removing the marker, so one of the two is always there to see
+    key = session.get('summary_key')
+    if key:
+        age = pending_age(key)
+        if age is not None and age <= PROCESSING_TIMEOUT:
+            return render_template('dashboard.html', agents=[], processing=True)
+
+    # If the last upload was rejected, show its validation error once and forget
+    # the upload
+    if key and not os.path.exists(summary_path(key)):
+        if os.path.exists(error_path(key)):
+            with open(error_path(key), encoding='utf-8') as f:
+                error = f.read()
+            session.pop('summary_key', None)
+            return error, 400
+        # An unexpected failure is shown once and then removed
+        if os.path.exists(failure_path(key)):
+            with open(failure_path(key), encoding='utf-8') as f:
+                error = f.read()
+            try:
+                os.remove(failure_path(key))
+            except FileNotFoundError:
+                pass  # already shown by another request
+            session.pop('summary_key', None)
+            return error, 500
+        # No outcome and no live job: the job was lost (e.g. its worker restarted)
+        session.pop('summary_key', None)
+        return "Processing of this upload did not finish; please upload the file again.", 500
+
+    # Load the agent_summary stored for this session and convert to list-of-dicts
+    data = load_summary().to_dict(orient='records')
     # Render the dashboard template, passing in the list of dicts
-    return render_template('dashboard.html', agents=data)
+    return render_template('dashboard.html', agents=data, processing=False)
 
 @app.route('/download_report')
 def download_report():
-    # 1) Get the summary data from session
-    data = session.get('agent_summary', [])
-    
-    # 2) Turn it back into a DataFrame
-    df = pd.DataFrame(data)
-    
-    # 3) Use a StringIO buffer to hold CSV data in memory
-    output = io.StringIO()
-    df.to_csv(output, index=False)
+    # 1) The summary stored at upload time is already a CSV: stream that file
+    #    as-is (no pandas, no re-serialization), with conditional/range support
+    key = session.get('summary_key')
+    if key and os.path.exists(summary_path(key)):
+        return send_file(
+            os.path.abspath(summary_path(key)),   # send_file resolves relative paths against the app root
+            mimetype='text/csv',
+            as_attachment=True,
+            download_name='agent_summary.csv',
+            conditional=True
+        )
+
+    # 2) No summary yet: write the empty report straight into a bytes buffer
+    output = io.BytesIO()
+    load_summary().to_csv(output, index=False, encoding='utf-8')
     output.seek(0)
     
-    # 4) Send it as a file download
+    # 3) Send it as a file download
     return send_file(
-        io.BytesIO(output.getvalue().encode()),   # file content
+        output,                                   # file content
         mimetype='text/csv',                      # CSV mime type
         as_attachment=True,                       # download instead of render
         download_name='agent_summary.csv'         # suggested filename
@@ -309,8 +571,7 @@ def download_report():
 
 # EPIC 4: Task 4.3: Admin‐only Threshold Settings
 @app.route('/settings', methods=['GET','POST'])
-@login_required
-@role_required('admin')
+@require('admin')
 def settings():
     error = None
 
@@ -342,4 +603,4 @@ def settings():
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=DEBUG)
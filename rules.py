@@ -1,9 +1,49 @@
 # rules.py
-from datetime import datetime
-from typing import Optional
+from datetime import date
+from functools import lru_cache
+from typing import Optional, Tuple
 from typing import cast
 
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import to_offset
+
+# int64 view of NaT, used to spot unparseable timestamps
+NAT_NS = np.datetime64('NaT', 'ns').view('i8')
+
+# One categorical dtype shared by every flag column, so all flags are int8
+# codes into the same category list and can be compared as integers
+FLAG_DTYPE = pd.CategoricalDtype(['OK', 'EXPIRED', 'INCOMPLETE', 'ALERT'])
+OK_CODE = FLAG_DTYPE.categories.get_loc('OK')
+EXPIRED_CODE = FLAG_DTYPE.categories.get_loc('EXPIRED')
+INCOMPLETE_CODE = FLAG_DTYPE.categories.get_loc('INCOMPLETE')
+ALERT_CODE = FLAG_DTYPE.categories.get_loc('ALERT')
+
+# Agent risk levels, ordered by severity
+RISK_DTYPE = pd.CategoricalDtype(['GREEN', 'YELLOW', 'RED'], ordered=True)
+
+@lru_cache(maxsize=1)
+def _today_ts(ordinal: int) -> pd.Timestamp:
+    """
+    Midnight Timestamp for a date ordinal; built once per calendar day
+    rather than on every call that defaults 'today'.
+    """
+    return pd.Timestamp.fromordinal(ordinal)
+
+
+def _alert_codes(mask: np.ndarray) -> np.ndarray:
+    """
+    int8 FLAG_DTYPE codes: ALERT where mask is True, else OK.
+    """
+    return np.where(mask, ALERT_CODE, OK_CODE).astype(np.int8)
+
+
+def _flag_series(codes: np.ndarray, index: pd.Index, name: str) -> pd.Series:
+    """
+    Wrap int8 FLAG_DTYPE codes as a categorical flag Series.
+    """
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=FLAG_DTYPE), index=index, name=name)
+
 
 def check_kyc_status(
     kyc_status: str,
@@ -16,9 +56,10 @@ def check_kyc_status(
       - 'EXPIRED'   if kyc_status == 'complete' but id_expiry < today
       - 'OK'        otherwise
     """
-    # If caller didn’t supply a 'today', use today’s date
+    # If caller didn’t supply a 'today', use today’s date (midnight),
+    # built once per calendar day
     if today is None:
-        today = pd.to_datetime(datetime.today().date())
+        today = _today_ts(date.today().toordinal())
 
     if kyc_status.lower() != 'complete':
         return 'INCOMPLETE'
@@ -30,6 +71,46 @@ def check_kyc_status(
     return 'OK'
 
 
+def _kyc_flag_codes(
+    kyc_status: pd.Series,
+    id_expiry: pd.Series,
+    today: Optional[pd.Timestamp] = None
+) -> np.ndarray:
+    """
+    int8 FLAG_DTYPE codes for check_kyc_status_series.
+    """
+    # If caller didn’t supply a 'today', use today’s date (midnight)
+    if today is None:
+        today = _today_ts(date.today().toordinal())
+
+    # Lower-case only the distinct statuses (the categories), not every row,
+    # then test each row's integer code against the codes that mean 'complete'.
+    # astype is a no-op for the categorical column the upload reader produces.
+    status = kyc_status.astype('category')
+    lowered = status.cat.categories.astype(str).str.lower()
+    complete_codes = np.flatnonzero(lowered == 'complete')
+
+    # Two boolean masks over the columns, then a single select
+    incomplete = ~np.isin(status.cat.codes.to_numpy(), complete_codes)
+    expired = (id_expiry.isna() | (id_expiry < today)).to_numpy()
+
+    return np.where(incomplete, INCOMPLETE_CODE, np.where(expired, EXPIRED_CODE, OK_CODE)).astype(np.int8)
+
+
+def check_kyc_status_series(
+    kyc_status: pd.Series,
+    id_expiry: pd.Series,
+    today: Optional[pd.Timestamp] = None
+) -> pd.Series:
+    """
+    Vectorized check_kyc_status over whole columns.
+    Returns a categorical Series of 'INCOMPLETE'/'EXPIRED'/'OK' aligned with kyc_status;
+    a missing id_expiry counts as expired.
+    """
+    codes = _kyc_flag_codes(kyc_status, id_expiry, today)
+    return _flag_series(codes, kyc_status.index, 'kyc_flag')
+
+
 def flag_high_value(txn_amount: float, threshold: float) -> str:
     """
     Returns 'ALERT' if txn_amount > threshold, else 'OK'.
@@ -37,6 +118,71 @@ def flag_high_value(txn_amount: float, threshold: float) -> str:
     return 'ALERT' if txn_amount > threshold else 'OK'
 
 
+def flag_high_value_series(txn_amounts: pd.Series, threshold: float) -> pd.Series:
+    """
+    Vectorized flag_high_value: categorical 'ALERT' where txn_amount > threshold, else 'OK'.
+    """
+    codes = _alert_codes(txn_amounts.to_numpy() > threshold)
+    return _flag_series(codes, txn_amounts.index, 'aml_flag')
+
+
+@lru_cache(maxsize=32)
+def _window_nanos(window: str) -> int:
+    """
+    Length of a fixed-size window string (e.g. '1H') in nanoseconds,
+    parsed once per distinct string.
+    """
+    return to_offset(window.lower()).nanos
+
+
+def _sorted_window_counts(
+    txn_times: pd.Series,
+    window: str
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Window counts for txn_times in time order, plus the permutation that
+    sorted them (None when the input was already in time order).
+    """
+    # 1) Parse to datetime (skipped when already datetime64) and view as int64 nanoseconds
+    if getattr(txn_times, 'dtype', None) is not None and txn_times.dtype.kind == 'M':
+        times = txn_times
+    else:
+        times = pd.to_datetime(txn_times, errors='coerce')
+    ts = np.asarray(times, dtype='datetime64[ns]').view('i8')
+    window_ns = _window_nanos(window)
+
+    # 2) Transaction logs usually arrive in time order; if so, skip the sort
+    #    and the scatter back. Otherwise stable-sort so equal timestamps keep
+    #    their original order. Unparseable times (NaT) sort first and count as 0
+    if np.all(ts[1:] >= ts[:-1]):
+        order = None
+        sorted_ts = ts
+    else:
+        order = np.argsort(ts, kind='stable')
+        sorted_ts = ts[order]
+    n_nat = int(np.searchsorted(sorted_ts, NAT_NS, side='right'))
+    valid_ts = sorted_ts[n_nat:]
+
+    # 3) Binary-search where each window (t - window, t] starts;
+    #    the count is every row from there up to and including itself
+    left = np.searchsorted(valid_ts, valid_ts - window_ns, side='right')
+    counts_sorted = np.zeros(len(ts), dtype=np.int64)
+    counts_sorted[n_nat:] = np.arange(1, len(valid_ts) + 1) - left
+
+    return counts_sorted, order
+
+
+def _unsort(values: np.ndarray, order: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Scatter values computed in sorted order back to the original order.
+    """
+    if order is None:
+        return values
+    result = np.empty_like(values)
+    result[order] = values
+    return result
+
+
 def compute_txns_last_window(
     txn_times: pd.Series,
     window: str
@@ -45,21 +191,26 @@ def compute_txns_last_window(
     For each timestamp in txn_times, count how many transactions
     occurred in the preceding `window` (e.g. '1H').
     """
-    # 1) Parse to datetime
-    times = pd.to_datetime(txn_times, errors='coerce')
-    window = window.lower()
+    counts_sorted, order = _sorted_window_counts(txn_times, window)
 
-    # 2) Build a Series of ones, indexed by timestamp
-    s = pd.Series(1, index=times).sort_index()
-
-    # 3) Sum those ones over the rolling window; result is counts per timestamp
-    counts = s.rolling(window).sum().fillna(0).astype(int)
+    # Return as a pd.Series so downstream code stays the same
+    return pd.Series(_unsort(counts_sorted, order), name='txns_last_window')
 
-    # 4) Map counts back to the original order of txn_times
-    result = [ counts.get(ts, 0) for ts in times ]
 
-    # Return as a pd.Series so downstream code stays the same
-    return pd.Series(result, name='txns_last_window')
+def flag_txn_frequency(
+    txn_times: pd.Series,
+    window: str,
+    limit: int
+) -> pd.Series:
+    """
+    compute_txns_last_window + compute_frequency_flag in one pass: returns a
+    categorical Series of 'ALERT'/'OK' for whether each transaction's
+    window count >= limit. The comparison runs on the sorted counts, so only
+    the int8 flag codes are scattered back and no count Series is built.
+    """
+    counts_sorted, order = _sorted_window_counts(txn_times, window)
+    codes = _unsort(_alert_codes(counts_sorted >= limit), order)
+    return _flag_series(codes, txn_times.index, 'frequency_flag')
 
 
 def compute_frequency_flag(
@@ -67,10 +218,45 @@ def compute_frequency_flag(
     limit: int
 ) -> pd.Series:
     """
-    Returns a Series of 'ALERT'/'OK' based on whether the per-window
-    transaction count >= limit.
+    Returns a categorical Series of 'ALERT'/'OK' based on whether the
+    per-window transaction count >= limit.
     """
-    return txns_last_window.apply(lambda cnt: 'ALERT' if cnt >= limit else 'OK')
+    codes = _alert_codes(txns_last_window.to_numpy() >= limit)
+    return _flag_series(codes, txns_last_window.index, 'frequency_flag')
+
+
+def _agent_risk_codes(
+    ids: np.ndarray,
+    kyc: np.ndarray,
+    aml: np.ndarray,
+    freq: np.ndarray,
+    n_agents: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-agent int8 RISK_DTYPE codes from agent codes and FLAG_DTYPE flag codes,
+    plus a mask of which agents have any rows.
+    """
+    # Per-row risk level as an int8 RISK_DTYPE code (2 = RED, 1 = YELLOW,
+    # 0 = GREEN) from integer compares. Levels are ordered by severity, so an
+    # agent's status is the highest level among its rows.
+    red = (kyc == EXPIRED_CODE) | (aml == ALERT_CODE) | (freq == ALERT_CODE)
+    level = np.where(red, 2, kyc == INCOMPLETE_CODE).astype(np.int8)
+
+    # Rows with no agent are ignored
+    has_id = ids >= 0
+    ids, level = ids[has_id], level[has_id]
+
+    # Direct-address aggregate instead of a hash groupby: scatter the levels into
+    # a per-agent array in rising order, so the highest level an agent has wins.
+    # Clean data is mostly GREEN, so skip the scatters when there is nothing to raise
+    seen = np.zeros(n_agents, dtype=bool)
+    seen[ids] = True
+    agent_level = np.zeros(n_agents, dtype=np.int8)
+    if level.any():
+        agent_level[ids[level == 1]] = 1
+        agent_level[ids[level == 2]] = 2
+
+    return agent_level, seen
 
 
 def aggregate_agent_risk(df: pd.DataFrame) -> pd.DataFrame:
@@ -84,19 +270,19 @@ def aggregate_agent_risk(df: pd.DataFrame) -> pd.DataFrame:
       - 'YELLOW' if any INCOMPLETE but no RED
       - 'GREEN'  otherwise
     """
-    def _agent_risk(group):
-        # Any red-level flags?
-        if (
-            (group['kyc_flag'] == 'EXPIRED').any() or
-            (group['aml_flag'] == 'ALERT').any() or
-            (group['frequency_flag'] == 'ALERT').any()
-        ):
-            return 'RED'
-        # Any incomplete KYCs?
-        if (group['kyc_flag'] == 'INCOMPLETE').any():
-            return 'YELLOW'
-        return 'GREEN'
-
-    df2 = df.set_index('agent_id')
-    risks = df2.groupby(level=0).apply(_agent_risk)
-    return risks.reset_index(name='risk_status')
+    # Flag columns as FLAG_DTYPE codes (a no-op for flags built by this module)
+    kyc = df['kyc_flag'].astype(FLAG_DTYPE).cat.codes.to_numpy()
+    aml = df['aml_flag'].astype(FLAG_DTYPE).cat.codes.to_numpy()
+    freq = df['frequency_flag'].astype(FLAG_DTYPE).cat.codes.to_numpy()
+
+    # Agent codes are dense indices into the category list (the cast is a no-op
+    # for the categorical agent_id the upload produces)
+    agent = df['agent_id'].astype('category')
+    ids = agent.cat.codes.to_numpy()
+    agent_level, seen = _agent_risk_codes(ids, kyc, aml, freq, len(agent.cat.categories))
+
+    # Agents in category order (sorted for inferred categories), as groupby gave
+    return pd.DataFrame({
+        'agent_id': agent.cat.categories[seen],
+        'risk_status': pd.Categorical.from_codes(agent_level[seen], dtype=RISK_DTYPE)
+    })
@@ -0,0 +1,156 @@
+# tests/test_app.py
+import os
+import pandas as pd
+import pytest
+from datetime import date
+from compliance_mvp import app as app_module
+from compliance_mvp.app import (
+    process_csv,
+    run_upload_job,
+    claim_job,
+    pending_path,
+    summary_path,
+    error_path,
+    failure_path,
+    thresholds
+)
+
+
+HEADER = "agent_id,agent_name,kyc_status,id_expiry,txn_amount,txn_time\n"
+ROWS = [
+    "A1,Ann,complete,2030-01-01,\"1,500\",2025-07-10 10:00\n",
+    "B2,Bob,Incomplete,2030-01-01,100,2025-07-10 10:05\n",
+    "A1,Ann,complete,2030-01-01,200,2025-07-10 10:10\n",
+    "C3,Cat,complete,2020-01-01,100,2025-07-10 12:00\n",
+    "D4,Dan,complete,2030-01-01,100,2025-07-10 18:00\n",
+    "B2,Bob,complete,2030-01-01,100,2025-07-10 19:00\n",
+]
+RUN_DATE = date(2025, 7, 10)
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    # Keep summaries in a temp folder; returns (result, summary DataFrame or None)
+    monkeypatch.setitem(app_module.app.config, 'CACHE_FOLDER', str(tmp_path))
+
+    def _run(body, chunk_size=100_000, key='k'):
+        monkeypatch.setattr(app_module, 'CSV_CHUNK_SIZE', chunk_size)
+        path = tmp_path / f'{key}.upload.csv'
+        path.write_text(body)
+        result = process_csv(str(path), key, dict(thresholds), RUN_DATE)
+        if result is not None:
+            return result, None
+        return result, pd.read_csv(summary_path(key), dtype=str)
+    return _run
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 4])
+def test_process_csv_chunked_matches_single_read(run, chunk_size):
+    # agents are split across chunks, so each chunk has its own agent_id categories
+    body = HEADER + ''.join(ROWS)
+    _, whole = run(body, key='whole')
+    result, chunked = run(body, chunk_size, key=f'chunked{chunk_size}')
+    assert result is None
+    assert chunked.to_dict(orient='records') == whole.to_dict(orient='records')
+    assert whole.to_dict(orient='records') == [
+        {'agent_id': 'A1', 'risk_status': 'RED'},
+        {'agent_id': 'B2', 'risk_status': 'YELLOW'},
+        {'agent_id': 'C3', 'risk_status': 'RED'},
+        {'agent_id': 'D4', 'risk_status': 'GREEN'},
+    ]
+
+def test_process_csv_missing_values_beat_invalid_types_across_chunks(run):
+    # bad amount in the first chunk, missing name in a later one
+    rows = list(ROWS)
+    rows[0] = rows[0].replace('"1,500"', 'abc')
+    rows[4] = rows[4].replace('Dan', '')
+    result, summary = run(HEADER + ''.join(rows), chunk_size=2)
+    assert result == ("CSV contains missing values", 400)
+    assert summary is None
+
+def test_process_csv_invalid_types_across_chunks(run):
+    # each bad column sits in a different chunk; the message keeps column order
+    rows = list(ROWS)
+    rows[4] = rows[4].replace('2030-01-01', 'notadate')
+    rows[0] = rows[0].replace('"1,500"', 'abc')
+    result, _ = run(HEADER + ''.join(rows), chunk_size=2)
+    assert result == ("Invalid data types in column(s): txn_amount, id_expiry", 400)
+
+def test_process_csv_missing_columns(run):
+    body = HEADER.replace('agent_name,', '').replace('txn_time', 'time') + "A1,complete,2030-01-01,100,2025-07-10 10:00\n"
+    result, _ = run(body)
+    assert result == ("Missing required columns: agent_name, txn_time", 400)
+
+def test_process_csv_header_only(run):
+    result, summary = run(HEADER, chunk_size=2)
+    assert result is None
+    assert summary.empty
+    assert list(summary.columns) == ['agent_id', 'risk_status']
+
+def test_process_csv_empty_file(run):
+    result, _ = run('')
+    assert result[1] == 400
+    assert result[0].startswith("Error reading and parsing file:")
+
+def test_process_csv_rejects_boolean_amounts(run):
+    rows = [r.replace('"1,500"', 'True').replace(',100,', ',False,').replace(',200,', ',True,') for r in ROWS]
+    result, _ = run(HEADER + ''.join(rows))
+    assert result == ("Invalid data types in column(s): txn_amount", 400)
+
+def test_process_csv_numeric_agent_ids_sort_numerically(run):
+    rows = [r.replace('A1,', '10,').replace('B2,', '9,').replace('C3,', '100,').replace('D4,', '2,') for r in ROWS]
+    result, summary = run(HEADER + ''.join(rows), chunk_size=2)
+    assert result is None
+    assert list(summary['agent_id']) == ['2', '9', '10', '100']
+
+def test_run_upload_job_does_not_store_unexpected_failures(run, tmp_path, monkeypatch):
+    # a failed summary write is reported once, not cached as the file's verdict
+    real_write = app_module.write_atomic
+    def disk_full(path, text):
+        if path == summary_path('k'):
+            raise OSError('No space left on device')
+        real_write(path, text)
+    monkeypatch.setattr(app_module, 'write_atomic', disk_full)
+    path = tmp_path / 'upload.csv'
+    path.write_text(HEADER + ''.join(ROWS))
+
+    with pytest.raises(OSError):
+        process_csv(str(path), 'k', dict(thresholds), RUN_DATE)
+
+    run_upload_job(str(path), 'k', dict(thresholds), RUN_DATE)
+    assert not os.path.exists(error_path('k'))
+    with open(failure_path('k')) as f:
+        assert f.read() == 'Error processing file: No space left on device'
+
+def test_claim_job_once_until_done_or_stale(run):
+    # only one request may queue a key; a job lost past the timeout can be requeued
+    assert claim_job('k')
+    assert not claim_job('k')
+    old = os.path.getmtime(pending_path('k')) - app_module.PROCESSING_TIMEOUT - 1
+    os.utime(pending_path('k'), (old, old))
+    assert claim_job('k')
+
+def test_run_upload_job_clears_pending_marker(run, tmp_path):
+    path = tmp_path / 'upload.csv'
+    path.write_text(HEADER.replace('agent_name,', ''))
+    assert claim_job('k')
+    run_upload_job(str(path), 'k', dict(thresholds), RUN_DATE)
+    assert not os.path.exists(pending_path('k'))
+    assert not path.exists()
+    with open(error_path('k')) as f:
+        assert f.read() == "Missing required columns: agent_name"
+
+def test_run_upload_job_evicts_old_cache_files(run, tmp_path):
+    # summaries from long-past runs are removed; fresh ones are kept
+    old, fresh = summary_path('old'), summary_path('fresh')
+    for summary in (old, fresh):
+        with open(summary, 'w') as f:
+            f.write('agent_id,risk_status\n')
+    stale = os.path.getmtime(old) - app_module.CACHE_MAX_AGE - 1
+    os.utime(old, (stale, stale))
+    path = tmp_path / 'upload.csv'
+    path.write_text(HEADER + ''.join(ROWS))
+    run_upload_job(str(path), 'k', dict(thresholds), RUN_DATE)
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
+    assert os.path.exists(summary_path('k'))
@@ -1,12 +1,16 @@
 # tests/test_rules.py
+import numpy as np
 import pandas as pd
 import pytest
 from datetime import datetime, timedelta
 from compliance_mvp.rules import (
     check_kyc_status,
+    check_kyc_status_series,
     flag_high_value,
+    flag_high_value_series,
     compute_txns_last_window,
     compute_frequency_flag,
+    flag_txn_frequency,
     aggregate_agent_risk
 )
 
@@ -32,6 +36,11 @@ def test_check_kyc_status_ok():
 def test_flag_high_value(amt, threshold, expected):
     assert flag_high_value(amt, threshold) == expected
 
+def test_flag_high_value_series():
+    amounts = pd.Series([500, 1000, 1000.1])
+    flags = flag_high_value_series(amounts, 1000)
+    assert list(flags) == ['OK', 'OK', 'ALERT']
+
 def test_compute_txns_last_window_basic():
     # timestamps one hour apart
     base = datetime(2025,7,10,10,0)
@@ -44,11 +53,55 @@ def test_compute_txns_last_window_basic():
     # at idx 0: only itself, at idx 1: two, at idx 2: only itself
     assert list(counts) == [1, 2, 1]
 
+def test_compute_txns_last_window_parses_strings():
+    times = pd.Series(['2025-07-10 10:00', '2025-07-10 10:30', 'not a time'])
+    counts = compute_txns_last_window(times, '1H')
+    assert list(counts) == [1, 2, 0]
+
+def test_compute_txns_last_window_unsorted_and_duplicates():
+    base = datetime(2025,7,10,10,0)
+    times = pd.Series([
+        pd.Timestamp(base + timedelta(minutes=90)),
+        pd.Timestamp(base),
+        pd.Timestamp(base + timedelta(minutes=30)),
+        pd.Timestamp(base + timedelta(minutes=30)),
+        None
+    ])
+    counts = compute_txns_last_window(times, '1H')
+    # duplicates are counted in input order; NaT counts as 0
+    assert list(counts) == [1, 1, 2, 3, 0]
+
+def test_compute_txns_last_window_matches_brute_force():
+    rng = np.random.default_rng(0)
+    base = pd.Timestamp('2025-07-10')
+    times = pd.Series(base + pd.to_timedelta(rng.integers(0, 6 * 3600, 300), unit='s'))
+    counts = compute_txns_last_window(times, '1H')
+    window = pd.Timedelta(hours=1)
+    # count of earlier-or-same rows inside (t - 1h, t], ties in input order
+    expected = [
+        sum(1 for j, u in enumerate(times) if t - window < u < t or (u == t and j <= i))
+        for i, t in enumerate(times)
+    ]
+    assert list(counts) == expected
+
 def test_compute_frequency_flag():
     counts = pd.Series([1,2,3,4])
     flags = compute_frequency_flag(counts, 3)
     assert list(flags) == ['OK','OK','ALERT','ALERT']
 
+def test_compute_frequency_flag_keeps_index():
+    counts = pd.Series([5, 0], index=[10, 20])
+    flags = compute_frequency_flag(counts, 3)
+    assert flags.to_dict() == {10: 'ALERT', 20: 'OK'}
+
+def test_flag_txn_frequency_matches_two_step():
+    rng = np.random.default_rng(1)
+    base = pd.Timestamp('2025-07-10')
+    times = pd.Series(base + pd.to_timedelta(rng.integers(0, 4 * 3600, 200), unit='s'))
+    fused = flag_txn_frequency(times, '1H', 3)
+    two_step = compute_frequency_flag(compute_txns_last_window(times, '1H'), 3)
+    assert list(fused) == list(two_step)
+
 def test_aggregate_agent_risk():
     df = pd.DataFrame([
         {'agent_id':'A','kyc_flag':'OK','aml_flag':'OK','frequency_flag':'OK'},
@@ -65,3 +118,61 @@ def test_aggregate_agent_risk():
         'C':'RED',    # had a frequency ALERT
         'D':'GREEN'   # all OK
     }
+
+def test_check_kyc_status_series_matches_scalar():
+    today = pd.to_datetime('2025-07-10')
+    status = pd.Series(['complete', 'Complete', 'incomplete', 'complete'])
+    expiry = pd.Series(pd.to_datetime(['2025-07-11', '2025-07-09', '2030-01-01', None]))
+    flags = check_kyc_status_series(status, expiry, today)
+    assert list(flags) == ['OK', 'EXPIRED', 'INCOMPLETE', 'EXPIRED']
+    assert isinstance(flags.dtype, pd.CategoricalDtype)
+
+def test_check_kyc_status_series_categorical_status():
+    today = pd.to_datetime('2025-07-10')
+    status = pd.Series(['COMPLETE', 'pending', None, 'complete'], dtype='category')
+    expiry = pd.Series(pd.to_datetime(['2030-01-01'] * 4))
+    flags = check_kyc_status_series(status, expiry, today)
+    assert list(flags) == ['OK', 'INCOMPLETE', 'INCOMPLETE', 'OK']
+    # the scalar rule takes str statuses only; a missing status is a column-only case
+    assert [f for f, s in zip(flags, status) if isinstance(s, str)] == [
+        check_kyc_status(s, e, today) for s, e in zip(status, expiry) if isinstance(s, str)
+    ]
+
+def test_check_kyc_status_tz_aware():
+    today = pd.Timestamp('2025-07-10', tz='UTC')
+    assert check_kyc_status('complete', pd.Timestamp('2025-07-11', tz='UTC'), today) == 'OK'
+    assert check_kyc_status('complete', pd.Timestamp('2025-07-09', tz='UTC'), today) == 'EXPIRED'
+
+def test_aggregate_agent_risk_categorical_flags_and_index():
+    df = pd.DataFrame({
+        'agent_id': ['B', 'A', 'B'],
+        'kyc_flag': pd.Categorical(['OK', 'INCOMPLETE', 'OK']),
+        'aml_flag': ['OK', 'OK', 'ALERT'],
+        'frequency_flag': ['OK', 'OK', 'OK'],
+    }, index=[7, 3, 5])
+    summary = aggregate_agent_risk(df)
+    assert summary.to_dict(orient='records') == [
+        {'agent_id': 'A', 'risk_status': 'YELLOW'},
+        {'agent_id': 'B', 'risk_status': 'RED'},
+    ]
+
+def test_aggregate_agent_risk_red_outranks_yellow():
+    # one agent with an INCOMPLETE row and a separate ALERT row is RED
+    df = pd.DataFrame([
+        {'agent_id':'A','kyc_flag':'INCOMPLETE','aml_flag':'OK','frequency_flag':'OK'},
+        {'agent_id':'A','kyc_flag':'OK','aml_flag':'OK','frequency_flag':'ALERT'},
+    ])
+    summary = aggregate_agent_risk(df)
+    assert list(summary['risk_status']) == ['RED']
+
+def test_aggregate_agent_risk_all_clean():
+    # no flags raised anywhere: every agent is GREEN
+    df = pd.DataFrame([
+        {'agent_id':'B','kyc_flag':'OK','aml_flag':'OK','frequency_flag':'OK'},
+        {'agent_id':'A','kyc_flag':'OK','aml_flag':'OK','frequency_flag':'OK'},
+    ])
+    summary = aggregate_agent_risk(df)
+    assert summary.to_dict(orient='records') == [
+        {'agent_id': 'A', 'risk_status': 'GREEN'},
+        {'agent_id': 'B', 'risk_status': 'GREEN'},
+    ]